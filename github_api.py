@@ -1,14 +1,81 @@
+import json
 import os
+import random
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+import requests_cache
 import streamlit as st
 
 GITHUB_API_BASE = "https://api.github.com"
 MAX_WORKERS = 10
 SEARCH_MAX_WORKERS = 3
+GRAPHQL_BATCH_SIZE = 50
+DETAILS_MAX_CONCURRENCY = 8
+DETAILS_INTER_BATCH_MS = 200
+RATE_LIMIT_RETRIES = 6
+RATE_LIMIT_MAX_WAIT = 300
+
+# Persistent HTTP cache next to slack_config.json: honours GitHub's Cache-Control and revalidates
+# stale entries with ETag/Last-Modified, and 304 responses do not count against the rate limit.
+session = requests_cache.CachedSession(
+    os.path.join(os.path.dirname(__file__), ".gh_cache"),
+    backend="sqlite",
+    wal=True,
+    expire_after=300,
+    cache_control=True,
+)
+API_CACHE_RETENTION = timedelta(days=1)
+
+# Last result of each search_prs query per (user, state, exclude_drafts), so later refreshes in this
+# process only ask GitHub for PRs updated since the newest updated_at already seen.
+_search_snapshots = {}
+_search_snapshots_lock = threading.Lock()
+
+PR_GRAPHQL_FIELDS = """
+      baseRefName additions deletions merged
+      reviews(last: 100) { nodes { author { login } state submittedAt } }
+      comments(last: 100) { nodes { author { login } createdAt updatedAt } }
+      reviewThreads(last: 50) { nodes { comments(last: 20) { nodes { author { login } createdAt updatedAt } } } }
+"""
+
+def clear_http_cache():
+    """Drop every cached GitHub response, plus the incremental search snapshots built from them."""
+    session.cache.clear()
+    with _search_snapshots_lock:
+        _search_snapshots.clear()
+
+def api_cache_cleanup():
+    """Prune responses older than API_CACHE_RETENTION and mark the rest stale.
+    Stale entries keep their ETags, so the next fetch is a conditional request that usually comes back 304.
+    """
+    session.cache.delete(older_than=API_CACHE_RETENTION)
+    session.cache.reset_expiration(0)
+
+def _request_with_backoff(method: str, url: str, **kwargs) -> requests.Response:
+    """session.request that waits out GitHub rate limiting (429, or 403 with Retry-After or no quota left).
+    Honours Retry-After when given, then X-RateLimit-Reset (capped at RATE_LIMIT_MAX_WAIT seconds),
+    otherwise backs off 1, 2, 4 ... 32s with jitter.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        resp = session.request(method, url, **kwargs)
+        retry_after = resp.headers.get("Retry-After", "")
+        limited = resp.status_code == 429 or (resp.status_code == 403 and (retry_after or resp.headers.get("X-RateLimit-Remaining") == "0"))
+        if not limited or attempt == RATE_LIMIT_RETRIES:
+            return resp
+        reset = resp.headers.get("X-RateLimit-Reset", "")
+        if retry_after.isdigit():
+            delay = int(retry_after)
+        elif resp.headers.get("X-RateLimit-Remaining") == "0" and reset.isdigit():
+            delay = min(max(int(reset) - time.time(), 0), RATE_LIMIT_MAX_WAIT)
+        else:
+            delay = 2 ** attempt
+        time.sleep(delay + random.uniform(0, 1))
+    return resp
 
 def get_headers():
     token = os.getenv("GITHUB_TOKEN", "")
@@ -32,8 +99,23 @@ def get_headers():
         headers["Authorization"] = f"token {token}"
     return headers
 
-@st.cache_data(ttl=3600)
-def search_prs(repos: list[str], usernames: list[str], state: str = "open", days_back: int = 90) -> list[dict]:
+def _merge_search_delta(snapshot, delta_items, state, since_date, exclude_drafts):
+    """Fold an updated:>= search into a previous search_prs snapshot, newest first.
+    With no snapshot the items are a full search result and are returned as-is.
+    """
+    if snapshot is None:
+        return delta_items
+    merged = dict(snapshot["items"])
+    for item in delta_items:
+        if item.get("state") == state and not (exclude_drafts and item.get("draft", False)):
+            merged[item["id"]] = item
+        else:
+            merged.pop(item["id"], None)
+    items = [item for item in merged.values() if item.get("created_at", "")[:10] >= since_date]
+    return sorted(items, key=lambda item: item.get("created_at", ""), reverse=True)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def search_prs(repos: list[str], usernames: list[str], state: str = "open", days_back: int = 90, exclude_drafts: bool = False) -> list[dict]:
     prs = []
     since_date = (datetime.utcnow() - timedelta(days=days_back)).strftime("%Y-%m-%d")
     repos_lower = [r.lower() for r in repos]
@@ -41,23 +123,50 @@ def search_prs(repos: list[str], usernames: list[str], state: str = "open", days
     def fetch_user_prs(username):
         time.sleep(0.5)
         user_prs = []
-        query = f"is:pr author:{username} state:{state} created:>={since_date}"
+        snapshot_key = (username.lower(), state, exclude_drafts)
+        with _search_snapshots_lock:
+            snapshot = _search_snapshots.get(snapshot_key)
+        full_query = f"is:pr author:{username} state:{state} created:>={since_date}"
+        if exclude_drafts:
+            full_query += " draft:false"
+        if snapshot and snapshot["since"] <= since_date:
+            query = f"is:pr author:{username} updated:>={snapshot['last_updated']}"
+        else:
+            snapshot = None
+            query = full_query
         url = f"{GITHUB_API_BASE}/search/issues"
-        params = {"q": query, "per_page": 100, "sort": "created", "order": "desc"}
-        try:
-            hdrs = get_headers()
-            resp = requests.get(url, headers=hdrs, params=params, timeout=30)
+        
+        def run_search(q):
+            params = {"q": q, "per_page": 100, "sort": "created", "order": "desc"}
+            resp = session.get(url, headers=get_headers(), params=params, timeout=30)
             if resp.status_code == 401:
                 st.error(f"GitHub API returned 401 Unauthorized - check your GITHUB_TOKEN")
             resp.raise_for_status()
-            data = resp.json()
-            total_found = data.get("total_count", 0)
-            for item in data.get("items", []):
+            return resp.json()
+        
+        try:
+            data = run_search(query)
+            if snapshot and data.get("total_count", 0) > len(data.get("items", [])):
+                # The delta overflowed one page; drop the snapshot and run the full query once.
+                with _search_snapshots_lock:
+                    _search_snapshots.pop(snapshot_key, None)
+                snapshot = None
+                data = run_search(full_query)
+            items = _merge_search_delta(snapshot, data.get("items", []), state, since_date, exclude_drafts)
+            total_found = len(items) if snapshot else data.get("total_count", 0)
+            last_updated = max((item.get("updated_at", "") for item in data.get("items", [])), default="")
+            with _search_snapshots_lock:
+                _search_snapshots[snapshot_key] = {
+                    "since": since_date,
+                    "last_updated": last_updated or (snapshot["last_updated"] if snapshot else since_date),
+                    "items": {item["id"]: item for item in items},
+                }
+            for item in items:
                 repo_url = item.get("repository_url", "")
                 repo_path = "/".join(repo_url.split("/")[-2:]).lower() if "/repos/" in repo_url else ""
                 if repo_path in repos_lower:
                     user_prs.append(item)
-            return (username, user_prs, None, total_found, len(data.get("items", [])))
+            return (username, user_prs, None, total_found, len(items))
         except Exception as e:
             return (username, [], str(e), 0, 0)
         return (username, user_prs, None, 0, 0)
@@ -81,7 +190,7 @@ def search_prs(repos: list[str], usernames: list[str], state: str = "open", days
 def get_pr_details(owner: str, repo: str, pr_number: int) -> Optional[dict]:
     url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/pulls/{pr_number}"
     try:
-        resp = requests.get(url, headers=get_headers(), timeout=30)
+        resp = _request_with_backoff("GET", url, headers=get_headers(), timeout=30)
         resp.raise_for_status()
         return resp.json()
     except Exception:
@@ -91,7 +200,7 @@ def get_pr_details(owner: str, repo: str, pr_number: int) -> Optional[dict]:
 def get_pr_reviews(owner: str, repo: str, pr_number: int) -> list[dict]:
     url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
     try:
-        resp = requests.get(url, headers=get_headers(), timeout=30)
+        resp = _request_with_backoff("GET", url, headers=get_headers(), timeout=30)
         resp.raise_for_status()
         return resp.json()
     except Exception:
@@ -101,7 +210,7 @@ def get_pr_reviews(owner: str, repo: str, pr_number: int) -> list[dict]:
 def get_pr_comments(owner: str, repo: str, pr_number: int) -> list[dict]:
     url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/issues/{pr_number}/comments"
     try:
-        resp = requests.get(url, headers=get_headers(), timeout=30)
+        resp = _request_with_backoff("GET", url, headers=get_headers(), timeout=30)
         resp.raise_for_status()
         return resp.json()
     except Exception:
@@ -111,29 +220,37 @@ def get_pr_comments(owner: str, repo: str, pr_number: int) -> list[dict]:
 def get_pr_review_comments(owner: str, repo: str, pr_number: int) -> list[dict]:
     url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/pulls/{pr_number}/comments"
     try:
-        resp = requests.get(url, headers=get_headers(), timeout=30)
+        resp = _request_with_backoff("GET", url, headers=get_headers(), timeout=30)
         resp.raise_for_status()
         return resp.json()
     except Exception:
         return []
 
+@lru_cache(maxsize=1024)
 def parse_repo_from_url(url: str) -> tuple[str, str]:
     parts = url.replace("https://github.com/", "").replace("https://api.github.com/repos/", "").split("/")
     if len(parts) >= 2:
         return parts[0], parts[1]
     return "", ""
 
+def parse_iso_naive(ts: str) -> datetime:
+    """Parse a GitHub ISO-8601 timestamp straight to a naive UTC datetime."""
+    if ts.endswith("Z"):
+        return datetime.fromisoformat(ts[:-1])
+    dt = datetime.fromisoformat(ts)
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
 def get_first_approval_time(reviews: list[dict]) -> Optional[datetime]:
     approvals = [r for r in reviews if r.get("state") == "APPROVED"]
     if approvals:
         approvals.sort(key=lambda x: x.get("submitted_at", ""))
-        return datetime.fromisoformat(approvals[0]["submitted_at"].replace("Z", "+00:00"))
+        return parse_iso_naive(approvals[0]["submitted_at"])
     return None
 
 def get_last_comment_time(comments: list[dict]) -> Optional[datetime]:
     if comments:
         comments.sort(key=lambda x: x.get("updated_at", x.get("created_at", "")), reverse=True)
-        return datetime.fromisoformat(comments[0].get("updated_at", comments[0]["created_at"]).replace("Z", "+00:00"))
+        return parse_iso_naive(comments[0].get("updated_at", comments[0]["created_at"]))
     return None
 
 def get_last_activity_time(issue_comments: list[dict], review_comments: list[dict], reviews: list[dict]) -> Optional[datetime]:
@@ -141,15 +258,15 @@ def get_last_activity_time(issue_comments: list[dict], review_comments: list[dic
     for c in issue_comments:
         ts = c.get("updated_at") or c.get("created_at")
         if ts:
-            all_times.append(datetime.fromisoformat(ts.replace("Z", "+00:00")))
+            all_times.append(parse_iso_naive(ts))
     for c in review_comments:
         ts = c.get("updated_at") or c.get("created_at")
         if ts:
-            all_times.append(datetime.fromisoformat(ts.replace("Z", "+00:00")))
+            all_times.append(parse_iso_naive(ts))
     for r in reviews:
         ts = r.get("submitted_at")
         if ts:
-            all_times.append(datetime.fromisoformat(ts.replace("Z", "+00:00")))
+            all_times.append(parse_iso_naive(ts))
     return max(all_times) if all_times else None
 
 @st.cache_data(ttl=300)
@@ -182,22 +299,74 @@ def get_pr_full_details(owner: str, repo: str, pr_number: int) -> dict:
     
     return results
 
-def get_multiple_prs_full_details(pr_list: list[tuple[str, str, int]]) -> dict:
-    """Fetch full details for multiple PRs in parallel.
+def _graphql_pr_to_rest(pr: dict) -> dict:
+    """Reshape a GraphQL pullRequest node into the REST-shaped dict get_pr_full_details returns."""
+    def comment(node):
+        return {"user": {"login": (node.get("author") or {}).get("login", "")}, "created_at": node.get("createdAt"), "updated_at": node.get("updatedAt")}
+    return {
+        "details": {"base": {"ref": pr.get("baseRefName", "")}, "additions": pr.get("additions", 0), "deletions": pr.get("deletions", 0), "merged": pr.get("merged", False)},
+        "reviews": [
+            {"user": {"login": (n.get("author") or {}).get("login", "")}, "state": n.get("state"), "submitted_at": n.get("submittedAt")}
+            for n in pr["reviews"]["nodes"] if n.get("submittedAt")
+        ],
+        "comments": [comment(n) for n in pr["comments"]["nodes"]],
+        "review_comments": [comment(n) for t in pr["reviewThreads"]["nodes"] for n in t["comments"]["nodes"]],
+    }
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_prs_graphql(pr_batch: tuple) -> dict:
+    """Fetch details, reviews and comments for up to GRAPHQL_BATCH_SIZE PRs in one GraphQL request.
+    PRs that could not be resolved are left out of the result.
+    """
+    parts = [
+        f"p{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{ pullRequest(number: {int(pr_num)}) {{{PR_GRAPHQL_FIELDS}    }} }}"
+        for i, (owner, repo, pr_num) in enumerate(pr_batch)
+    ]
+    resp = _request_with_backoff("POST", f"{GITHUB_API_BASE}/graphql", headers=get_headers(), json={"query": "query {\n" + "\n".join(parts) + "\n}"}, timeout=60)
+    resp.raise_for_status()
+    data = resp.json().get("data") or {}
+    results = {}
+    for i, pr_key in enumerate(pr_batch):
+        pr = (data.get(f"p{i}") or {}).get("pullRequest")
+        if pr:
+            results[pr_key] = _graphql_pr_to_rest(pr)
+    return results
+
+def get_multiple_prs_full_details(pr_list: list[tuple[str, str, int]], max_concurrency: int = DETAILS_MAX_CONCURRENCY, inter_batch_ms: int = DETAILS_INTER_BATCH_MS) -> dict:
+    """Fetch full details for multiple PRs.
+    
+    Uses batched GraphQL queries when a token is configured and falls back to
+    per-PR REST calls for anything GraphQL could not return. REST fetches run at
+    most max_concurrency at a time, started in waves inter_batch_ms apart, to stay
+    clear of GitHub's secondary rate limits.
     
     Args:
         pr_list: List of (owner, repo, pr_number) tuples
+        max_concurrency: Maximum PRs fetched over REST at once
+        inter_batch_ms: Pause between each wave of max_concurrency REST fetches
     
     Returns:
         Dict mapping (owner, repo, pr_number) to full details
     """
     results = {}
+    pr_list = list(dict.fromkeys(pr_list))
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_pr = {
-            executor.submit(get_pr_full_details, owner, repo, pr_num): (owner, repo, pr_num)
-            for owner, repo, pr_num in pr_list
-        }
+    if "Authorization" in get_headers():
+        batches = [tuple(pr_list[i:i + GRAPHQL_BATCH_SIZE]) for i in range(0, len(pr_list), GRAPHQL_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS) as executor:
+            for future in as_completed([executor.submit(_fetch_prs_graphql, batch) for batch in batches]):
+                try:
+                    results.update(future.result())
+                except Exception:
+                    pass
+    
+    pending = [pr_key for pr_key in pr_list if pr_key not in results]
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        future_to_pr = {}
+        for i, pr_key in enumerate(pending):
+            if i and i % max_concurrency == 0:
+                time.sleep(inter_batch_ms / 1000)
+            future_to_pr[executor.submit(get_pr_full_details, *pr_key)] = pr_key
         for future in as_completed(future_to_pr):
             pr_key = future_to_pr[future]
             try:
@@ -208,8 +377,8 @@ def get_multiple_prs_full_details(pr_list: list[tuple[str, str, int]]) -> dict:
     return results
 
 
-@st.cache_data(ttl=3600)
-def search_merged_prs(repos: list[str], usernames: list[str], days_back: int = 90) -> list[dict]:
+@st.cache_data(ttl=3600, show_spinner=False)
+def search_merged_prs(repos: list[str], usernames: list[str], days_back: int = 90, exclude_drafts: bool = False) -> list[dict]:
     """Search for merged PRs by users."""
     prs = []
     since_date = (datetime.utcnow() - timedelta(days=days_back)).strftime("%Y-%m-%d")
@@ -219,10 +388,12 @@ def search_merged_prs(repos: list[str], usernames: list[str], days_back: int = 9
         time.sleep(0.5)
         user_prs = []
         query = f"is:pr author:{username} is:merged merged:>={since_date}"
+        if exclude_drafts:
+            query += " draft:false"
         url = f"{GITHUB_API_BASE}/search/issues"
         params = {"q": query, "per_page": 100, "sort": "created", "order": "desc"}
         try:
-            resp = requests.get(url, headers=get_headers(), params=params, timeout=30)
+            resp = session.get(url, headers=get_headers(), params=params, timeout=30)
             resp.raise_for_status()
             data = resp.json()
             for item in data.get("items", []):
@@ -243,7 +414,7 @@ def search_merged_prs(repos: list[str], usernames: list[str], days_back: int = 9
     return prs
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def search_reviewed_prs(repos: list[str], usernames: list[str], days_back: int = 90) -> dict:
     """Search for PRs reviewed by users using Pulls API.
     Search API reviewed-by: doesn't work for private repos, so we fetch closed PRs
@@ -266,7 +437,7 @@ def search_reviewed_prs(repos: list[str], usernames: list[str], days_back: int =
             url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/pulls"
             params = {"state": "closed", "per_page": 100, "page": page, "sort": "updated", "direction": "desc"}
             try:
-                resp = requests.get(url, headers=get_headers(), params=params, timeout=30)
+                resp = session.get(url, headers=get_headers(), params=params, timeout=30)
                 resp.raise_for_status()
                 prs = resp.json()
                 if not prs:
@@ -274,7 +445,7 @@ def search_reviewed_prs(repos: list[str], usernames: list[str], days_back: int =
                 for pr in prs:
                     updated = pr.get("updated_at", "")
                     if updated:
-                        pr_date = datetime.fromisoformat(updated.replace("Z", "+00:00")).replace(tzinfo=None)
+                        pr_date = parse_iso_naive(updated)
                         if pr_date < since_date:
                             return all_prs
                     all_prs.append((owner, repo_name, pr))
@@ -291,7 +462,7 @@ def search_reviewed_prs(repos: list[str], usernames: list[str], days_back: int =
         pr_number = pr.get("number")
         url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/pulls/{pr_number}/reviews"
         try:
-            resp = requests.get(url, headers=get_headers(), timeout=30)
+            resp = session.get(url, headers=get_headers(), timeout=30)
             resp.raise_for_status()
             reviews = resp.json()
             return (owner, repo_name, pr, reviews)
@@ -326,7 +497,7 @@ def search_reviewed_prs(repos: list[str], usernames: list[str], days_back: int =
     return results
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def _fetch_all_open_prs(repos: list[str]) -> list[dict]:
     """Fetch all open PRs from given repos. Shared by reviewer lookup functions."""
     def fetch_open_prs_for_repo(repo):
@@ -340,7 +511,7 @@ def _fetch_all_open_prs(repos: list[str]) -> list[dict]:
             url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/pulls"
             params = {"state": "open", "per_page": 100, "page": page}
             try:
-                resp = requests.get(url, headers=get_headers(), params=params, timeout=30)
+                resp = session.get(url, headers=get_headers(), params=params, timeout=30)
                 resp.raise_for_status()
                 prs = resp.json()
                 if not prs:
@@ -365,7 +536,7 @@ def _fetch_all_open_prs(repos: list[str]) -> list[dict]:
     return all_open_prs
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def search_review_requested_prs(repos: list[str], usernames: list[str]) -> dict:
     """Search for open PRs where review is requested from users.
     Uses Pulls API with requested_reviewers field since Search API review-requested:
@@ -392,12 +563,12 @@ def get_review_time_for_user(reviews: list[dict], pr_created_at: str, username:
     if not user_reviews:
         return None
     user_reviews.sort(key=lambda x: x.get("submitted_at", ""))
-    first_review_time = datetime.fromisoformat(user_reviews[0]["submitted_at"].replace("Z", "+00:00"))
-    pr_created = datetime.fromisoformat(pr_created_at.replace("Z", "+00:00"))
+    first_review_time = parse_iso_naive(user_reviews[0]["submitted_at"])
+    pr_created = parse_iso_naive(pr_created_at)
     return (first_review_time - pr_created).total_seconds() / 3600
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def search_prs_where_user_is_reviewer(repos: list[str], usernames: list[str]) -> dict:
     """Search for open PRs where user is listed as a reviewer (requested or already reviewed).
     Returns PRs where user appears in requested_reviewers OR has submitted a review.
@@ -423,7 +594,7 @@ def search_prs_where_user_is_reviewer(repos: list[str], usernames: list[str]) ->
         pr_number = pr.get("number")
         url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/pulls/{pr_number}/reviews"
         try:
-            resp = requests.get(url, headers=get_headers(), timeout=30)
+            resp = session.get(url, headers=get_headers(), timeout=30)
             resp.raise_for_status()
             reviews = resp.json()
             return (pr, reviews)
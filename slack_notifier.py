@@ -1,9 +1,16 @@
 import os
+import re
 import json
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
-from github_api import search_prs, get_pr_reviews, get_pr_comments, get_pr_review_comments, get_pr_details, parse_repo_from_url, get_first_approval_time, get_last_comment_time, get_last_activity_time, search_review_requested_prs, get_multiple_prs_full_details
+from github_api import search_prs, parse_repo_from_url, parse_iso_naive, get_first_approval_time, get_last_comment_time, get_last_activity_time, search_review_requested_prs, get_multiple_prs_full_details
+
+# Shared keep-alive session so the conversations.open + chat.postMessage calls reuse one connection.
+slack_session = requests.Session()
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "slack_config.json")
 
@@ -26,12 +33,12 @@ def get_schedule_for_user(username: str, config: dict) -> dict:
         return user_overrides[username]
     return schedules.get("team_default", {"enabled": True, "frequency": "weekly", "days_of_week": ["Monday"], "time": "09:00", "timezone": "America/Los_Angeles"})
 
-def should_run_now(schedule: dict, last_run_time: datetime = None) -> bool:
+def should_run_now(schedule: dict, last_run_time: datetime = None, now: datetime = None) -> bool:
     if not schedule.get("enabled", True):
         return False
     
     tz = pytz.timezone(schedule.get("timezone", "America/Los_Angeles"))
-    now = datetime.now(tz)
+    now = now.astimezone(tz) if now else datetime.now(tz)
     scheduled_time = datetime.strptime(schedule.get("time", "09:00"), "%H:%M").time()
     
     current_hour_min = now.strftime("%H:%M")
@@ -83,7 +90,7 @@ def should_run_now(schedule: dict, last_run_time: datetime = None) -> bool:
     
     return False
 
-def get_users_to_notify(config: dict) -> list:
+def get_users_to_notify(config: dict, now: datetime = None) -> list:
     usernames = config.get("usernames", [])
     last_runs = load_last_run()
     users_to_notify = []
@@ -93,11 +100,81 @@ def get_users_to_notify(config: dict) -> list:
         last_run_str = last_runs.get(username)
         last_run_time = datetime.fromisoformat(last_run_str) if last_run_str else None
         
-        if should_run_now(schedule, last_run_time):
+        if should_run_now(schedule, last_run_time, now=now):
             users_to_notify.append(username)
     
     return users_to_notify
 
+def next_fire_time(schedule: dict, last_run_time: datetime = None, after: datetime = None, horizon_days: int = 366):
+    """Return the first scheduled slot strictly after `after` that should_run_now would accept, or None."""
+    if not schedule.get("enabled", True):
+        return None
+    tz = pytz.timezone(schedule.get("timezone", "America/Los_Angeles"))
+    after = (after or datetime.now(pytz.UTC)).astimezone(tz)
+    slot_time = datetime.strptime(schedule.get("time", "09:00"), "%H:%M").time()
+    for day_offset in range(horizon_days + 1):
+        day = after.date() + timedelta(days=day_offset)
+        candidate = tz.localize(datetime.combine(day, slot_time))
+        if candidate > after and should_run_now(schedule, last_run_time, now=candidate):
+            return candidate
+    return None
+
+def next_reminder_time(config: dict, after: datetime = None):
+    """Earliest upcoming reminder slot across all configured users, or None if nothing is scheduled."""
+    last_runs = load_last_run()
+    fire_times = []
+    for username in config.get("usernames", []):
+        last_run_str = last_runs.get(username)
+        last_run_time = datetime.fromisoformat(last_run_str) if last_run_str else None
+        fire_time = next_fire_time(get_schedule_for_user(username, config), last_run_time, after)
+        if fire_time:
+            fire_times.append(fire_time)
+    return min(fire_times) if fire_times else None
+
+def _config_mtime() -> float:
+    return os.path.getmtime(CONFIG_FILE) if os.path.exists(CONFIG_FILE) else 0.0
+
+def run_daemon(dry_run: bool = False, poll_seconds: int = 60):
+    """Sleep until the next scheduled reminder, send it, repeat. Saving slack_config.json reschedules."""
+    after = datetime.now(pytz.UTC) - timedelta(minutes=5)
+    while True:
+        try:
+            config = get_config_with_defaults()
+            config_mtime = _config_mtime()
+            fire_time = next_reminder_time(config, after)
+        except Exception as e:
+            print(f"[{datetime.now().isoformat()}] Failed to load schedule, retrying: {e}")
+            time.sleep(poll_seconds)
+            continue
+        print(f"[{datetime.now().isoformat()}] Next reminder: {fire_time.isoformat() if fire_time else 'none scheduled'}")
+        
+        reloaded = False
+        while fire_time is None or datetime.now(pytz.UTC) < fire_time:
+            wait = poll_seconds if fire_time is None else (fire_time - datetime.now(pytz.UTC)).total_seconds()
+            time.sleep(max(0, min(wait, poll_seconds)))
+            if _config_mtime() != config_mtime:
+                print(f"[{datetime.now().isoformat()}] Config changed, rescheduling")
+                reloaded = True
+                break
+        if reloaded:
+            # Slots that passed while we waited on the old schedule must not fire late.
+            after = max(after, datetime.now(pytz.UTC) - timedelta(minutes=5))
+            continue
+        
+        after = fire_time
+        # Match users against the slot itself, so a late wake-up still lands inside should_run_now's window.
+        try:
+            usernames = get_users_to_notify(config, now=fire_time)
+            if not usernames:
+                continue
+            print(f"[{datetime.now().isoformat()}] Scheduled reminders for: {', '.join(usernames)}")
+            results = send_reminders(config.get("repos"), usernames, config, dry_run=dry_run)
+            sent_users = [r["user"] for r in results if r["status"] == "sent"]
+            if sent_users and not dry_run:
+                update_last_run_for_users(sent_users)
+        except Exception as e:
+            print(f"[{datetime.now().isoformat()}] Reminder run failed, skipping to the next slot: {e}")
+
 def update_last_run_for_users(usernames: list):
     last_runs = load_last_run()
     now_str = datetime.now(pytz.UTC).isoformat()
@@ -105,13 +182,11 @@ def update_last_run_for_users(usernames: list):
         last_runs[username] = now_str
     save_last_run(last_runs)
 
+_CP_RE = re.compile(r'cherry[- ]?pick|\[cp\]|\(cp\)', re.IGNORECASE)
+
+@lru_cache(maxsize=4096)
 def is_cherrypick_pr(title: str, base_branch: str = "") -> bool:
-    title_lower = title.lower()
-    if any(pattern in title_lower for pattern in ['cherry-pick', 'cherrypick', 'cherry pick', '[cp]', '(cp)']):
-        return True
-    if base_branch.startswith('release/'):
-        return True
-    return False
+    return bool(_CP_RE.search(title)) or base_branch.startswith('release/')
 
 def load_config():
     if os.path.exists(CONFIG_FILE):
@@ -119,8 +194,8 @@ def load_config():
             return json.load(f)
     return {}
 
-def get_config_with_defaults():
-    config = load_config()
+def get_config_with_defaults(config: dict = None):
+    config = load_config() if config is None else dict(config)
     if "repos" not in config:
         config["repos"] = ["snowflakedb/frostdb", "snowflakedb/fdb-tls-tools"]
     if "orgs" in config:
@@ -136,8 +211,10 @@ def get_config_with_defaults():
     return config
 
 def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
+    tmp_path = f"{CONFIG_FILE}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(config, f, indent=2)
+    os.replace(tmp_path, CONFIG_FILE)
 
 def get_slack_token():
     config = load_config()
@@ -153,6 +230,15 @@ def get_user_display_names():
 
 SLACK_MAX_MESSAGE_LENGTH = 3800
 
+REMINDER_FOOTER = [
+    "",
+    "---",
+    "Please take a moment to review these PRs. If any are stalled, we would like to understand the blockers so I can help move them forward. Is the inactivity due to:",
+    "a) Pending reviews (stakeholders or area-experts)?",
+    "b) Technical hurdles or shifting priorities?",
+    "Let me know where we can step in to clear the path or nudge the right/concerned folks.",
+]
+
 def _split_message(message: str, max_len: int = SLACK_MAX_MESSAGE_LENGTH) -> list:
     if len(message) <= max_len:
         return [message]
@@ -183,7 +269,7 @@ def send_slack_dm(slack_user_id: str, message: str) -> bool:
         "Content-Type": "application/json"
     }
     
-    open_resp = requests.post(
+    open_resp = slack_session.post(
         "https://slack.com/api/conversations.open",
         headers=headers,
         json={"users": slack_user_id}
@@ -197,7 +283,7 @@ def send_slack_dm(slack_user_id: str, message: str) -> bool:
     
     chunks = _split_message(message)
     for chunk in chunks:
-        msg_resp = requests.post(
+        msg_resp = slack_session.post(
             "https://slack.com/api/chat.postMessage",
             headers=headers,
             json={
@@ -212,30 +298,37 @@ def send_slack_dm(slack_user_id: str, message: str) -> bool:
     
     return True
 
+def _fetch_pr_data(prs: list) -> dict:
+    """Batch-fetch details, reviews and comments for search results, keyed by (owner, repo, number)."""
+    pr_keys = []
+    for pr in prs:
+        owner, repo = parse_repo_from_url(pr.get("repository_url", ""))
+        if owner and repo:
+            pr_keys.append((owner, repo, pr.get("number")))
+    return get_multiple_prs_full_details(pr_keys) if pr_keys else {}
+
 def find_stale_prs(repos: list, username: str, hours_inactive: int = 24, exclude_drafts: bool = True, days_back: int = 90, exclude_cherrypicks: bool = False) -> list:
     prs = search_prs(repos, [username], state="open", days_back=days_back)
+    if exclude_drafts:
+        prs = [pr for pr in prs if not pr.get("draft", False)]
+    all_pr_data = _fetch_pr_data(prs)
     stale = []
     now = datetime.utcnow()
     
     for pr in prs:
-        if exclude_drafts and pr.get("draft", False):
-            continue
         owner, repo = parse_repo_from_url(pr.get("repository_url", ""))
-        pr_number = pr.get("number")
+        pr_data = all_pr_data.get((owner, repo, pr.get("number")), {})
         
-        details = get_pr_details(owner, repo, pr_number) if owner and repo else None
+        details = pr_data.get("details")
         base_branch = details.get("base", {}).get("ref", "") if details else ""
         
         if exclude_cherrypicks and is_cherrypick_pr(pr.get("title", ""), base_branch):
             continue
         
-        issue_comments = get_pr_comments(owner, repo, pr_number) if owner and repo else []
-        review_comments = get_pr_review_comments(owner, repo, pr_number) if owner and repo else []
-        reviews = get_pr_reviews(owner, repo, pr_number) if owner and repo else []
-        last_activity = get_last_activity_time(issue_comments, review_comments, reviews)
+        last_activity = get_last_activity_time(pr_data.get("comments", []), pr_data.get("review_comments", []), pr_data.get("reviews", []))
         
-        created_at = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00")).replace(tzinfo=None)
-        last_activity_dt = last_activity.replace(tzinfo=None) if last_activity else created_at
+        created_at = parse_iso_naive(pr["created_at"])
+        last_activity_dt = last_activity or created_at
         
         hours_since_activity = (now - last_activity_dt).total_seconds() / 3600
         
@@ -250,23 +343,20 @@ def find_stale_prs(repos: list, username: str, hours_inactive: int = 24, exclude
     return stale
 
 def find_stale_drafts(repos: list, username: str, days_draft_stale: int = 7, days_back: int = 90, exclude_cherrypicks: bool = False) -> list:
-    prs = search_prs(repos, [username], state="open", days_back=days_back)
+    prs = [pr for pr in search_prs(repos, [username], state="open", days_back=days_back) if pr.get("draft", False)]
+    all_pr_data = _fetch_pr_data(prs)
     stale_drafts = []
     now = datetime.utcnow()
     
     for pr in prs:
-        if not pr.get("draft", False):
-            continue
-        
         owner, repo = parse_repo_from_url(pr.get("repository_url", ""))
-        pr_number = pr.get("number")
-        details = get_pr_details(owner, repo, pr_number) if owner and repo else None
+        details = all_pr_data.get((owner, repo, pr.get("number")), {}).get("details")
         base_branch = details.get("base", {}).get("ref", "") if details else ""
         
         if exclude_cherrypicks and is_cherrypick_pr(pr.get("title", ""), base_branch):
             continue
         
-        created_at = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00")).replace(tzinfo=None)
+        created_at = parse_iso_naive(pr["created_at"])
         days_as_draft = (now - created_at).days
         
         if days_as_draft >= days_draft_stale:
@@ -281,25 +371,25 @@ def find_stale_drafts(repos: list, username: str, days_draft_stale: int = 7, day
 
 def find_approved_not_merged(repos: list, username: str, days_threshold: int = 1, exclude_drafts: bool = True, days_back: int = 90, exclude_cherrypicks: bool = False) -> list:
     prs = search_prs(repos, [username], state="open", days_back=days_back)
+    if exclude_drafts:
+        prs = [pr for pr in prs if not pr.get("draft", False)]
+    all_pr_data = _fetch_pr_data(prs)
     approved_pending = []
     
     for pr in prs:
-        if exclude_drafts and pr.get("draft", False):
-            continue
         owner, repo = parse_repo_from_url(pr.get("repository_url", ""))
-        pr_number = pr.get("number")
+        pr_data = all_pr_data.get((owner, repo, pr.get("number")), {})
         
-        details = get_pr_details(owner, repo, pr_number) if owner and repo else None
+        details = pr_data.get("details")
         base_branch = details.get("base", {}).get("ref", "") if details else ""
         
         if exclude_cherrypicks and is_cherrypick_pr(pr.get("title", ""), base_branch):
             continue
         
-        reviews = get_pr_reviews(owner, repo, pr_number) if owner and repo else []
-        first_approval = get_first_approval_time(reviews)
+        first_approval = get_first_approval_time(pr_data.get("reviews", []))
         
         if first_approval:
-            days_since_approval = (datetime.utcnow() - first_approval.replace(tzinfo=None)).days
+            days_since_approval = (datetime.utcnow() - first_approval).days
             if days_since_approval >= days_threshold:
                 approved_pending.append({
                     "pr": pr,
@@ -360,11 +450,7 @@ def format_reminder_message(username: str, stale_prs: list, approved_prs: list,
             time_str = f"{int(hours // 24)}d {int(hours % 24)}h" if hours >= 24 else f"{int(hours)}h"
             lines.append(f"  • {sla_indicator} <{pr['html_url']}|PR #{pr['number']}>: \"{pr['title'][:50]}\" by {author} - {time_str}")
     
-    lines.append("\n---")
-    lines.append("Please take a moment to review these PRs. If any are stalled, we would like to understand the blockers so I can help move them forward. Is the inactivity due to:")
-    lines.append("a) Pending reviews (stakeholders or area-experts)?")
-    lines.append("b) Technical hurdles or shifting priorities?")
-    lines.append("Let me know where we can step in to clear the path or nudge the right/concerned folks.")
+    lines.extend(REMINDER_FOOTER)
     
     return "\n".join(lines)
 
@@ -382,6 +468,7 @@ def send_reminders(repos: list, usernames: list, config: dict = None, dry_run: b
     user_slack_map = config.get("user_slack_mapping") or get_user_slack_mapping()
     user_display_names = config.get("user_display_names") or get_user_display_names()
     results = []
+    pending_sends = []
     
     awaiting_review_all = search_review_requested_prs(repos, usernames)
     
@@ -408,6 +495,7 @@ def send_reminders(repos: list, usernames: list, config: dict = None, dry_run: b
         
         awaiting_review_items = []
         now = datetime.utcnow()
+        username_lc = username.lower()
         for pr in awaiting_review_prs:
             owner = pr.get("_owner", "")
             repo = pr.get("_repo", "")
@@ -418,15 +506,13 @@ def send_reminders(repos: list, usernames: list, config: dict = None, dry_run: b
             pr_details = all_pr_data.get((owner, repo, pr_number), {})
             reviews = pr_details.get("reviews", [])
             
-            user_has_reviewed = any(
-                r.get("user", {}).get("login", "").lower() == username.lower()
-                for r in reviews
-            )
+            reviewer_logins = {(r.get("user") or {}).get("login", "").lower() for r in reviews}
+            user_has_reviewed = username_lc in reviewer_logins
             
             if user_has_reviewed:
                 continue
             
-            created_at = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00")).replace(tzinfo=None)
+            created_at = parse_iso_naive(pr["created_at"])
             hours_waiting = int((now - created_at).total_seconds() / 3600)
             awaiting_review_items.append({
                 "pr": pr,
@@ -454,8 +540,15 @@ def send_reminders(repos: list, usernames: list, config: dict = None, dry_run: b
             print(f"Warning: No Slack ID for {username}")
             continue
         
-        success = send_slack_dm(slack_id, message)
-        results.append({"user": username, "status": "sent" if success else "failed", "message": message})
+        results.append({"user": username, "status": "failed", "message": message})
+        pending_sends.append((results[-1], slack_id, message))
+    
+    # Each DM is a couple of Slack round-trips; send them concurrently once every message is built.
+    if pending_sends:
+        with ThreadPoolExecutor(max_workers=min(8, len(pending_sends))) as pool:
+            outcomes = pool.map(lambda item: send_slack_dm(item[1], item[2]), pending_sends)
+            for (result, _, _), success in zip(pending_sends, outcomes):
+                result["status"] = "sent" if success else "failed"
     
     return results
 
@@ -466,8 +559,13 @@ if __name__ == "__main__":
     parser.add_argument("--dry-run", action="store_true", help="Preview messages without sending")
     parser.add_argument("--check-schedule", action="store_true", help="Check if any scheduled reminders should run now")
     parser.add_argument("--force", action="store_true", help="Force send to all users, ignoring schedule")
+    parser.add_argument("--daemon", action="store_true", help="Stay running and send scheduled reminders when they are due")
     args = parser.parse_args()
     
+    if args.daemon:
+        run_daemon(dry_run=args.dry_run)
+        exit(0)
+    
     config = get_config_with_defaults()
     repos = config.get("repos")
     all_usernames = config.get("usernames")
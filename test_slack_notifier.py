@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+import slack_notifier
+
+
+class _StopDaemon(BaseException):
+    """Raised to end run_daemon's loop; a BaseException so the daemon's own error handling lets it through."""
+
+
+def test_daemon_reload_does_not_fire_slots_already_past(monkeypatch):
+    """A daily 10:00 override saved at 14:00 fires tomorrow at 10:00, not immediately."""
+    clock = {"now": datetime(2026, 10, 12, 8, 0, tzinfo=pytz.UTC)}  # Monday 08:00 UTC
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            now = clock["now"]
+            return now.astimezone(tz) if tz else now.replace(tzinfo=None)
+
+    def fake_sleep(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+
+    saved_at = datetime(2026, 10, 12, 14, 0, tzinfo=pytz.UTC)
+    team_default = {"enabled": True, "frequency": "weekly", "days_of_week": ["Friday"], "time": "09:00", "timezone": "UTC"}
+    override = {"frequency": "daily", "time": "10:00", "timezone": "UTC"}
+
+    def fake_config():
+        overrides = {"alice": override} if clock["now"] >= saved_at else {}
+        return {"usernames": ["alice"], "repos": [], "schedules": {"team_default": team_default, "user_overrides": overrides}}
+
+    fire_times = []
+    real_next_reminder_time = slack_notifier.next_reminder_time
+
+    def recording_next_reminder_time(config, after=None):
+        fire_time = real_next_reminder_time(config, after)
+        fire_times.append(fire_time)
+        if len(fire_times) == 2:
+            raise _StopDaemon
+        return fire_time
+
+    sends = []
+
+    monkeypatch.setattr(slack_notifier, "datetime", FakeDatetime)
+    monkeypatch.setattr(slack_notifier.time, "sleep", fake_sleep)
+    monkeypatch.setattr(slack_notifier, "get_config_with_defaults", fake_config)
+    monkeypatch.setattr(slack_notifier, "_config_mtime", lambda: 1.0 if clock["now"] >= saved_at else 0.0)
+    monkeypatch.setattr(slack_notifier, "load_last_run", lambda: {})
+    monkeypatch.setattr(slack_notifier, "next_reminder_time", recording_next_reminder_time)
+    monkeypatch.setattr(slack_notifier, "send_reminders", lambda *args, **kwargs: sends.append(clock["now"]) or [])
+
+    with pytest.raises(_StopDaemon):
+        slack_notifier.run_daemon(poll_seconds=60)
+
+    assert sends == []
+    assert fire_times[1] == datetime(2026, 10, 13, 10, 0, tzinfo=pytz.UTC)